@@ -15,7 +15,10 @@ def init_plugin(project):
     if os_default:
         project.set_property_if_unset(INTEGRATION_ARTIFACT_BUCKET, os_default)
     project.set_property_if_unset(TAVERN_TEST_DIR, DEFAULT_TAVERN_TEST_DIR)
-    project.plugin_depends_on("pytest")
+    project.set_property_if_unset(TAVERN_PARALLEL, True)
+    # pythonpath ini option used for tavern runs needs pytest 7
+    project.plugin_depends_on("pytest", ">=7.0")
+    project.plugin_depends_on("pytest-xdist")
     project.plugin_depends_on("tavern")
 
 
@@ -40,7 +43,14 @@ def verify_cypress(project: Project, logger: Logger, reactor: Reactor):
 
 
 @task(description="Run integration tests using tavern specifications.\n"
-                  f"\t{TAVERN_TEST_DIR} - directory containing tavern specifications ({DEFAULT_TAVERN_TEST_DIR})")
+                  f"\t{TAVERN_TEST_DIR} - directory containing tavern specifications ({DEFAULT_TAVERN_TEST_DIR})\n"
+                  f"\t{TAVERN_ADDITIONAL_ARGS} - extra pytest arguments, relative files that exist in the test "
+                  f"directory are resolved against it\n"
+                  "\tTests run from the project root, not the test directory - files that specifications or "
+                  "helpers open relative to the working directory must be absolute or built from the test file path\n"
+                  f"\t{TAVERN_PARALLEL} - run tavern test files in parallel with pytest-xdist (default TRUE, "
+                  "serial on machines with 3 or fewer CPUs). Parallel runs set pytest's pythonpath to the test "
+                  "directory, replacing a pythonpath configured in its ini file")
 def verify_tavern(project: Project, logger: Logger, reactor: Reactor):
     tasks.verify_tavern(project, logger, reactor)
 
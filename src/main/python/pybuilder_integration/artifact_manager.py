@@ -1,5 +1,6 @@
 import os
 import shutil
+import threading
 from typing import Dict
 
 from pybuilder.core import Project, Logger
@@ -29,16 +30,20 @@ class S3ArtifactManager(ArtifactManager):
 
     def __init__(self):
         super().__init__("AWS S3 Artifact Manager", "S3")
+        # uploads may run concurrently, only one of them should try to create the bucket
+        self._bucket_lock = threading.Lock()
 
     def upload(self, file: str, project: Project, logger: Logger, reactor: Reactor):
         if project.get_property("abort_upload","false") != "false":
             return
         # First make sure bucket exists
-        self.create_bucket(logger, project, reactor)
+        with self._bucket_lock:
+            self.create_bucket(logger, project, reactor)
+        log_file_name = f"s3-artifact-transfer-{os.path.basename(file)}"
         relative_path = get_latest_artifact_destination(logger, project)
-        self._s3_transfer(file, relative_path, project, reactor, logger, recursive=False)
+        self._s3_transfer(file, relative_path, project, reactor, logger, recursive=False, log_file_name=log_file_name)
         relative_path = get_versioned_artifact_destination(logger, project)
-        self._s3_transfer(file, relative_path, project, reactor, logger, recursive=False)
+        self._s3_transfer(file, relative_path, project, reactor, logger, recursive=False, log_file_name=log_file_name)
 
     def download_artifacts(self, project: Project, logger: Logger, reactor: Reactor):
         # this is a noop if there is no bucket
@@ -46,30 +51,37 @@ class S3ArtifactManager(ArtifactManager):
             return
         s3_location = get_latest_artifact_destination(logger, project)
         zipped_directory = get_latest_zipped_distribution_directory(project)
+        # sync only fetches artifacts that changed since they were last downloaded into the zipped directory
         self._s3_transfer(source=s3_location,
                           destination=zipped_directory,
                           project=project,
                           logger=logger,
-                          reactor=reactor)
+                          reactor=reactor,
+                          sync=True)
         return _unzip_downloaded_artifacts(zipped_directory, get_latest_distribution_directory(project), logger)
 
     @staticmethod
-    def _s3_transfer(source, destination, project, reactor, logger, recursive=True):
+    def _s3_transfer(source, destination, project, reactor, logger, recursive=True,
+                     log_file_name='s3-artifact-transfer', sync=False):
         logger.info(f"Proceeding to transfer {source} to {destination}")
         S3ArtifactManager.verify_aws_cli(reactor)
         #  aws s3 cp myDir s3://mybucket/ --recursive
+        #  aws s3 sync s3://mybucket/ myDir --delete
         args = [
             's3',
-            'cp',
+            'sync' if sync else 'cp',
             source,
             destination
         ]
-        if recursive:
+        if sync:
+            # drop artifacts that are no longer in LATEST so they are not unzipped again
+            args.append("--delete")
+        elif recursive:
             args.append("--recursive")
         exec_utility.exec_command(command_name='aws',
                                   args=args,
                                   failure_message=f"Failed to transfer integration artifacts to {destination}",
-                                  log_file_name='s3-artifact-transfer',
+                                  log_file_name=log_file_name,
                                   project=project,
                                   reactor=reactor,
                                   logger=logger,
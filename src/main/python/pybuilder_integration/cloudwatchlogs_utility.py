@@ -18,6 +18,13 @@ class CloudwatchLogs():
             self.cwclient = boto3.client('logs')
         return self.cwclient
 
+    def prefetch_client(self):
+        # creating the boto3 client loads the service model, callers can overlap this with other work
+        try:
+            self._get_cloudwatch_logs_client()
+        except Exception as ex:
+            self.logger.debug(f"Error creating cloudwatch logs client {str(ex)}")
+
     def print_latest(self):
         try:
             self.print_latest_for_group(self.group_name)
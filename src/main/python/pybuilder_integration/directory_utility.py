@@ -1,6 +1,10 @@
 import os
 import shutil
 import tempfile
+import weakref
+
+# integration directories per project, prepared once per build
+_prepared_directories = weakref.WeakKeyDictionary()
 
 
 def prepare_reports_directory(project):
@@ -16,17 +20,44 @@ def prepare_dist_directory(project):
 
 
 def prepare_directory(dir_variable, project):
-    package__format = f"{dir_variable}/integration"
-    reports_dir = project.expand_path(package__format)
-    return _ensure_directory_exists(reports_dir)
+    # every command execution asks for the logs directory so only expand and create it once
+    directories = _prepared_directories.setdefault(project, {})
+    reports_dir = directories.get(dir_variable)
+    if reports_dir is None:
+        package__format = f"{dir_variable}/integration"
+        reports_dir = directories[dir_variable] = _ensure_directory_exists(project.expand_path(package__format))
+    return reports_dir
 
 
 def _ensure_directory_exists(path):
-    if not os.path.exists(path):
-        os.makedirs(path)
+    # roles may prepare the same directory concurrently
+    os.makedirs(path, exist_ok=True)
     return path
 
 
+def merge_directory(source, destination):
+    # moving or hard linking only touches metadata, fall back to a copy across devices
+    try:
+        os.rename(source, destination)
+        return
+    except OSError:
+        pass
+    for root, dirs, files in os.walk(source):
+        destination_root = os.path.join(destination, os.path.relpath(root, source))
+        os.makedirs(destination_root, exist_ok=True)
+        for file in files:
+            source_file = os.path.join(root, file)
+            destination_file = os.path.join(destination_root, file)
+            try:
+                os.remove(destination_file)
+            except FileNotFoundError:
+                pass
+            try:
+                os.link(source_file, destination_file)
+            except OSError:
+                shutil.copy2(source_file, destination_file)
+
+
 def get_working_distribution_directory(project):
     dist_directory = prepare_dist_directory(project)
     return _ensure_directory_exists(f"{dist_directory}/working")
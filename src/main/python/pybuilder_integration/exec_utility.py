@@ -23,9 +23,9 @@ def exec_command(command_name,
                                            env=env_vars,
                                            cwd=working_dir)
     else:
-        command = ExternalCommandBuilder(command_name=command_name,
-                                         project=project,
-                                         reactor=reactor)
+        command = LogFileCommandBuilder(command_name=command_name,
+                                        project=project,
+                                        reactor=reactor)
 
     for arg in args:
         command.use_argument(arg)
@@ -44,19 +44,41 @@ def exec_command(command_name,
     return True
 
 
-class WorkingDirCommandBuilder(ExternalCommandBuilder):
+class LogFileCommandResult(ExternalCommandResult):
+    # command output can grow to many MB (cypress, npm) so only read it back from the log files on demand
+
+    def __init__(self, exit_code, report_file, error_report_file):
+        self.exit_code = exit_code
+        self.report_file = report_file
+        self.error_report_file = error_report_file
+
+    @property
+    def report_lines(self):
+        return read_file(self.report_file)
+
+    @property
+    def error_report_lines(self):
+        return read_file(self.error_report_file)
+
+
+class LogFileCommandBuilder(ExternalCommandBuilder):
+
+    def run(self, outfile_name):
+        # output is written straight to the log files by the child process
+        error_file_name = "{0}.err".format(outfile_name)
+        return_code = self._execute(outfile_name)
+        return LogFileCommandResult(return_code, outfile_name, error_file_name)
+
+    def _execute(self, outfile_name):
+        return self._env.execute_command(self.parts, outfile_name)
+
+
+class WorkingDirCommandBuilder(LogFileCommandBuilder):
 
     def __init__(self, command_name, project, cwd, reactor, env=None):
         super(WorkingDirCommandBuilder, self).__init__(command_name, project, reactor)
         self.env = env if env else {}
         self.cwd = cwd
 
-    def run(self, outfile_name):
-        error_file_name = "{0}.err".format(outfile_name)
-        return_code = self._env.execute_command(self.parts, outfile_name, env=self.env, cwd=self.cwd)
-        error_file_lines = read_file(error_file_name)
-        outfile_lines = read_file(outfile_name)
-
-        return ExternalCommandResult(return_code,
-                                     outfile_name, outfile_lines,
-                                     error_file_name, error_file_lines)
+    def _execute(self, outfile_name):
+        return self._env.execute_command(self.parts, outfile_name, env=self.env, cwd=self.cwd)
@@ -1,7 +1,11 @@
 import os
-import shutil
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
 
-import pytest
 from pybuilder.core import Project, Logger, init, RequirementsFile
 from pybuilder.errors import BuildFailedException
 from pybuilder.install_utils import install_dependencies
@@ -9,69 +13,201 @@ from pybuilder.reactor import Reactor
 
 from pybuilder_integration import exec_utility, tool_utility
 from pybuilder_integration.artifact_manager import get_artifact_manager
-from pybuilder_integration.cloudwatchlogs_utility import CloudwatchLogs
 from pybuilder_integration.directory_utility import prepare_dist_directory, get_working_distribution_directory, \
-    package_artifacts, prepare_reports_directory, get_local_zip_artifact_path, prepare_logs_directory
+    package_artifacts, prepare_reports_directory, get_local_zip_artifact_path, prepare_logs_directory, merge_directory
 from pybuilder_integration.properties import *
-from pybuilder_integration.tool_utility import install_cypress
+
+# relative to the cypress test directory
+CYPRESS_EXECUTABLE = os.path.join("node_modules", "cypress", "bin", "cypress")
+CYPRESS_PACKAGE_JSON = os.path.join("node_modules", "cypress", "package.json")
+# concurrent cypress roles all collapse their output into ./target
+_target_merge_lock = threading.Lock()
+# pytest options taking a marker or keyword expression rather than a path
+_EXPRESSION_OPTIONS = ("-m", "-k")
+
+
+@dataclass(frozen=True)
+class CypressConfig:
+    target_url: str
+    environment: str
+    record: bool
+    env_vars: dict
+    reports_dir: str
+
+
+def get_cypress_config(project: Project) -> CypressConfig:
+    # resolved once per task so each cypress directory does not walk the project properties again
+    return CypressConfig(target_url=project.get_mandatory_property(INTEGRATION_TARGET_URL),
+                         environment=project.get_mandatory_property(ENVIRONMENT),
+                         record=project.get_property("record_cypress", True),
+                         env_vars=project.get_property(ENVIRONMENT_VARIABLES, {}),
+                         reports_dir=prepare_reports_directory(project))
+
+
+@dataclass(frozen=True)
+class TavernConfig:
+    target_url: str
+    environment: str
+    application: str
+    extra_args: tuple
+    pytest_args: tuple
+    parallel: bool
+    reports_dir: str
+    logs_dir: str
+
+
+def get_tavern_config(project: Project) -> TavernConfig:
+    # resolved once per task so each tavern directory does not expand the additional args again
+    extra_args = tuple(project.expand(prop) for prop in project.get_property(TAVERN_ADDITIONAL_ARGS, []))
+    pytest_args = []
+    workers = _available_workers()
+    # -P tavern_parallel=false arrives as a string, so parse it like abort_upload
+    parallel = str(project.get_property(TAVERN_PARALLEL, True)).lower() != "false" and workers > 1
+    if parallel:
+        # tavern suites are bound by HTTP round trips so spread the files over pytest-xdist workers
+        pytest_args.extend(["-n", str(workers)])
+    if project.get_property("verbose"):
+        # xdist workers cannot print live (-s) so report the captured output of every test instead
+        pytest_args.append("-rA" if parallel else "-s")
+        pytest_args.append("-v")
+    return TavernConfig(target_url=project.get_property(INTEGRATION_TARGET_URL),
+                        environment=project.get_property(ENVIRONMENT),
+                        application=project.get_property(APPLICATION),
+                        extra_args=extra_args,
+                        pytest_args=tuple(pytest_args),
+                        parallel=parallel,
+                        reports_dir=prepare_reports_directory(project),
+                        logs_dir=prepare_logs_directory(project))
 
 
 def integration_artifact_push(project: Project, logger: Logger, reactor: Reactor):
     logger.info("Starting upload of integration artifacts")
     manager = get_artifact_manager(project)
-    for tool in ["tavern", "cypress"]:
-        artifact_file = get_local_zip_artifact_path(tool=tool, project=project, include_ending=True)
-        if os.path.exists(artifact_file):
+    artifact_files = [get_local_zip_artifact_path(tool=tool, project=project, include_ending=True)
+                      for tool in ["tavern", "cypress"]]
+    artifact_files = [artifact_file for artifact_file in artifact_files if os.path.isfile(artifact_file)]
+    # uploads are network bound so let them overlap
+    with ThreadPoolExecutor(max_workers=max(1, len(artifact_files))) as executor:
+        futures = []
+        for artifact_file in artifact_files:
             logger.info(
                 f"Starting upload of integration artifact: {os.path.basename(artifact_file)} to: {manager.friendly_name}")
-            manager.upload(file=artifact_file, project=project, logger=logger, reactor=reactor)
+            futures.append(executor.submit(manager.upload, file=artifact_file, project=project, logger=logger,
+                                           reactor=reactor))
+        for future in as_completed(futures):
+            future.result()
 
 
 def verify_environment(project: Project, logger: Logger, reactor: Reactor):
     dist_directory = project.get_property(WORKING_TEST_DIR, get_working_distribution_directory(project))
     logger.info(f"Preparing to run tests found in: {dist_directory}")
-    _run_tests_in_directory(dist_directory, logger, project, reactor)
+    cypress_config = get_cypress_config(project)
+    tavern_config = get_tavern_config(project)
+    _run_tests_in_directory(dist_directory, logger, project, reactor, cypress_config=cypress_config,
+                            tavern_config=tavern_config)
     artifact_manager = get_artifact_manager(project=project)
     latest_directory = artifact_manager.download_artifacts(project=project, logger=logger, reactor=reactor)
-    _run_tests_in_directory(latest_directory, logger, project, reactor, latest=True)
+    _run_tests_in_directory(latest_directory, logger, project, reactor, latest=True, cypress_config=cypress_config,
+                            tavern_config=tavern_config)
     if project.get_property(PROMOTE_ARTIFACT, True):
         integration_artifact_push(project=project, logger=logger, reactor=reactor)
 
 
-def _run_tests_in_directory(dist_directory, logger, project, reactor, latest=False):
-    cypress_test_path = f"{dist_directory}/cypress"
-    if os.path.exists(cypress_test_path):
+def _run_tests_in_directory(dist_directory, logger, project, reactor, latest=False, cypress_config=None,
+                            tavern_config=None):
+    tool_directories = _list_tool_directories(dist_directory)
+    if not tool_directories:
+        logger.info(f"Skipping integration tests: no tests found in {dist_directory}")
+        return
+    cypress_test_path = tool_directories.get("cypress")
+    if cypress_test_path:
         logger.info(f"Found cypress tests - starting run latest: {latest}")
         if latest:
-            for dir in os.listdir(cypress_test_path):
-                if os.path.isdir(f"{cypress_test_path}/{dir}"):
-                    logger.info(f"Running {dir}")
-                    _run_cypress_tests_in_directory(work_dir=f"{cypress_test_path}/{dir}",
-                                                    logger=logger,
-                                                    project=project,
-                                                    reactor=reactor)
+            roles = _list_role_directories(cypress_test_path)
+            # cypress only shells out so each role can run in its own thread
+            failures = {}
+            with ThreadPoolExecutor(max_workers=_max_workers(len(roles))) as executor:
+                futures = {}
+                for entry in roles:
+                    logger.info(f"Running {entry.name}")
+                    future = executor.submit(_run_cypress_tests_in_directory,
+                                             work_dir=entry.path,
+                                             logger=logger,
+                                             project=project,
+                                             reactor=reactor,
+                                             role=entry.name,
+                                             config=cypress_config)
+                    futures[future] = entry.name
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except BuildFailedException as ex:
+                        failures[futures[future]] = ex
+            _raise_for_failed_roles("Cypress", failures)
         else:
             _run_cypress_tests_in_directory(work_dir=cypress_test_path,
                                             logger=logger,
                                             project=project,
-                                            reactor=reactor)
-    tavern_test_path = f"{dist_directory}/tavern"
-    if os.path.exists(tavern_test_path):
+                                            reactor=reactor,
+                                            config=cypress_config)
+    tavern_test_path = tool_directories.get("tavern")
+    if tavern_test_path:
         logger.info(f"Found tavern tests - starting run latest: {latest}")
         if latest:
-            for dir in os.listdir(tavern_test_path):
-                if os.path.isdir(f"{tavern_test_path}/{dir}"):
-                    logger.info(f"Running {dir}")
-                    _run_tavern_tests_in_dir(test_dir=f"{tavern_test_path}/{dir}",
+            # pytest.main runs in-process and mutates os.environ so roles stay sequential
+            failures = {}
+            for entry in _list_role_directories(tavern_test_path):
+                logger.info(f"Running {entry.name}")
+                try:
+                    _run_tavern_tests_in_dir(test_dir=entry.path,
                                              logger=logger,
                                              project=project,
                                              reactor=reactor,
-                                             role=os.path.basename(dir))
+                                             role=entry.name,
+                                             config=tavern_config)
+                except BuildFailedException as ex:
+                    failures[entry.name] = ex
+            _raise_for_failed_roles("Tavern", failures)
         else:
-            _run_tavern_tests_in_dir(test_dir=f"{tavern_test_path}",
+            _run_tavern_tests_in_dir(test_dir=tavern_test_path,
                                      logger=logger,
                                      project=project,
-                                     reactor=reactor)
+                                     reactor=reactor,
+                                     config=tavern_config)
+
+
+def _list_tool_directories(dist_directory):
+    # one directory read finds both tool directories, dist_directory is None when there was nothing to download
+    if not dist_directory:
+        return {}
+    try:
+        with os.scandir(dist_directory) as it:
+            return {entry.name: entry.path for entry in it
+                    if entry.name in ("cypress", "tavern") and entry.is_dir()}
+    except FileNotFoundError:
+        return {}
+
+
+def _raise_for_failed_roles(tool, failures):
+    # run every role before failing so one build reports all of the broken ones
+    if failures:
+        details = "\n".join(f"\t{role} - {ex}" for role, ex in sorted(failures.items()))
+        raise BuildFailedException(f"{tool} tests failed for roles: {', '.join(sorted(failures))}\n{details}")
+
+
+def _list_role_directories(path):
+    # scandir entries know whether they are directories without an extra stat per child
+    with os.scandir(path) as it:
+        return [entry for entry in it if entry.is_dir(follow_symlinks=False)]
+
+
+def _available_workers():
+    # leave some headroom for the build itself
+    return max(1, (os.cpu_count() or 1) - 2)
+
+
+def _max_workers(jobs):
+    return max(1, min(jobs, _available_workers()))
 
 
 def verify_cypress(project: Project, logger: Logger, reactor: Reactor):
@@ -81,43 +217,67 @@ def verify_cypress(project: Project, logger: Logger, reactor: Reactor):
         package_artifacts(project, work_dir, "cypress", project.get_property(ROLE))
 
 
-def _run_cypress_tests_in_directory(work_dir, logger, project, reactor: Reactor):
-    target_url = project.get_mandatory_property(INTEGRATION_TARGET_URL)
-    environment = project.get_mandatory_property(ENVIRONMENT)
-    if not os.path.exists(work_dir):
+def _run_cypress_tests_in_directory(work_dir, logger, project, reactor: Reactor, role=None,
+                                    config: CypressConfig = None):
+    if config is None:
+        config = get_cypress_config(project)
+    file_names = _list_file_names(work_dir)
+    if file_names is None:
         logger.info("Skipping cypress run: no tests")
         return False
-    logger.info(f"Found {len(os.listdir(work_dir))} files in cypress test directory")
+    logger.info(f"Found {len(file_names)} files in cypress test directory")
     # Validate NPM install and Install cypress
-    package_json = os.path.join(work_dir, "package.json")
-    if os.path.exists(package_json):
+    if "package.json" in file_names:
         logger.info("Found package.json installing dependencies")
-        tool_utility.install_npm_dependencies(work_dir, project=project, logger=logger, reactor=reactor)
+        tool_utility.install_npm_dependencies_if_changed(work_dir, project=project, logger=logger, reactor=reactor,
+                                                         role=role)
     else:
-        install_cypress(logger=logger, project=project, reactor=reactor, work_dir=work_dir)
-    executable = os.path.join(work_dir, "node_modules/cypress/bin/cypress")
-    results_file, run_name = get_test_report_file(project=project, test_dir=work_dir, tool="cypress")
+        tool_utility.install_cypress(logger=logger, project=project, reactor=reactor, work_dir=work_dir, role=role)
+    executable = _resolve_cypress_executable(work_dir)
+    results_file, run_name = get_test_report_file(project=project, test_dir=work_dir, tool="cypress",
+                                                  reports_dir=config.reports_dir, role=role)
     # Run the actual tests against the baseURL provided by ${integration_target}
-    args = ["run", "--config", f"baseUrl={target_url}", "--reporter-options",
+    args = ["run", "--config", f"baseUrl={config.target_url}", "--reporter-options",
             f"mochaFile={results_file}"]
-    if project.get_property("record_cypress", True):
+    if config.record:
         args.append('--record')
-    config_file_path = f'{environment}-config.json'
-    if os.path.exists(os.path.join(work_dir, config_file_path)):
+    config_file_path = f'{config.environment}-config.json'
+    if config_file_path in file_names:
         args.append("--config-file")
         args.append(config_file_path)
-    environment_variables = project.get_property(ENVIRONMENT_VARIABLES,{})
-    logger.info(f"Running cypress on host: {target_url}")
+    logger.info(f"Running cypress on host: {config.target_url}")
+    # roles may run concurrently so keep their logs apart
+    log_file_name = f'cypress_run-{role}.log' if role else 'cypress_run.log'
     exec_utility.exec_command(command_name=executable, args=args,
-                              failure_message="Failed to execute cypress tests", log_file_name='cypress_run.log',
+                              failure_message="Failed to execute cypress tests", log_file_name=log_file_name,
                               project=project, reactor=reactor, logger=logger, working_dir=work_dir, report=False,
-                              env_vars=environment_variables)
+                              env_vars=config.env_vars)
     # workaround but cypress output are relative to location of cypress.json so we need to collapse
-    if os.path.exists(f"{work_dir}/target"):
-        shutil.copytree(f"{work_dir}/target", "./target", dirs_exist_ok=True)
+    work_dir_target = os.path.join(work_dir, "target")
+    if os.path.exists(work_dir_target):
+        with _target_merge_lock:
+            merge_directory(work_dir_target, "./target")
     return True
 
 
+def _resolve_cypress_executable(work_dir):
+    # fail before launching anything if the install did not leave a usable cypress behind
+    try:
+        installed = os.stat(os.path.join(work_dir, CYPRESS_PACKAGE_JSON)).st_mtime
+    except FileNotFoundError:
+        raise BuildFailedException(f"Cypress is not installed in {work_dir}")
+    return _cypress_executable(work_dir, installed)
+
+
+@lru_cache(maxsize=64)
+def _cypress_executable(work_dir, installed):
+    # keyed on the cypress package.json mtime so a reinstall is checked again
+    executable = os.path.join(work_dir, CYPRESS_EXECUTABLE)
+    if not os.access(executable, os.X_OK):
+        raise BuildFailedException(f"Cypress executable is missing or not executable: {executable}")
+    return executable
+
+
 def verify_tavern(project: Project, logger: Logger, reactor: Reactor):
     # Expand the directory to get full path
     test_dir = project.expand_path(f"${TAVERN_TEST_DIR}")
@@ -126,45 +286,117 @@ def verify_tavern(project: Project, logger: Logger, reactor: Reactor):
         package_artifacts(project, test_dir, "tavern", project.get_property(ROLE))
 
 
-def _run_tavern_tests_in_dir(test_dir: str, logger: Logger, project: Project, reactor: Reactor, role=None):
+def _run_tavern_tests_in_dir(test_dir: str, logger: Logger, project: Project, reactor: Reactor, role=None,
+                             config: TavernConfig = None):
+    if config is None:
+        config = get_tavern_config(project)
     logger.info("Running tavern tests: {}".format(test_dir))
-    if not os.path.exists(test_dir):
+    file_names = _list_file_names(test_dir)
+    if file_names is None:
         logger.info("Skipping tavern run: no tests")
         return False
-    logger.info(f"Found {len(os.listdir(test_dir))} files in tavern test directory")
-    # todo is this unique enough for each run?
-    output_file, run_name = get_test_report_file(project, test_dir)
-    from sys import path as syspath
-    syspath.insert(0, test_dir)
+    logger.info(f"Found {len(file_names)} files in tavern test directory")
+    output_file, run_name = get_test_report_file(project, test_dir, reports_dir=config.reports_dir, role=role)
     # install any requirements that my exist
-    requirements_file = os.path.join(test_dir, "requirements.txt")
-    if os.path.exists(requirements_file):
+    if "requirements.txt" in file_names:
+        requirements_file = os.path.join(test_dir, "requirements.txt")
         dependency = RequirementsFile(requirements_file)
         install_dependencies(logger, project, dependency, reactor.pybuilder_venv,
-                             f"{prepare_logs_directory(project)}/install_tavern_pip_dependencies.log")
-    extra_args = [project.expand(prop) for prop in project.get_property(TAVERN_ADDITIONAL_ARGS, [])]
-    args = ["--junit-xml", f"{output_file}", test_dir] + extra_args
-    if project.get_property("verbose"):
-        args.append("-s")
-        args.append("-v")
-    os.environ['TARGET'] = project.get_property(INTEGRATION_TARGET_URL)
-    os.environ[ENVIRONMENT] = project.get_property(ENVIRONMENT)
-    logger.info(f"Running against: {project.get_property(INTEGRATION_TARGET_URL)} ")
-    cache_wd = os.getcwd()
+                             f"{config.logs_dir}/install_tavern_pip_dependencies.log")
+    # absolute paths and an explicit rootdir let pytest run without changing the working directory
+    args = ["--rootdir", test_dir, "--junit-xml", output_file, test_dir,
+            *_resolve_relative_args(config.extra_args, test_dir), *config.pytest_args]
+    if config.parallel:
+        # xdist workers start from the sys.path frozen on its first import, pythonpath is applied by every worker
+        # so helper modules are imported from this test_dir (pytest splits the value with shlex)
+        args.extend(["-o", f"pythonpath={shlex.quote(test_dir)}"])
+    environment_variables = {'TARGET': config.target_url, ENVIRONMENT: config.environment}
+    logger.info(f"Running against: {config.target_url} ")
+    # pytest pulls in a large module tree so it is only imported when tavern actually runs
+    import pytest
+    cloudwatch_logs = None
+    if role:
+        # boto3 is only needed when printing logs for a deployed role
+        from pybuilder_integration.cloudwatchlogs_utility import CloudwatchLogs
+        cloudwatch_logs = CloudwatchLogs(config.environment, config.application, role, logger)
+    from sys import path as syspath
+    if not config.parallel:
+        # in-process run, leaves any pythonpath configured for the test directory untouched
+        syspath.insert(0, test_dir)
     try:
-        os.chdir(test_dir)
-        ret = pytest.main(args)
+        with ThreadPoolExecutor(max_workers=1) as executor, _scoped_environ(environment_variables):
+            if cloudwatch_logs:
+                # set up the cloudwatch client while the tests are running
+                executor.submit(cloudwatch_logs.prefetch_client)
+            ret = pytest.main(args)
     finally:
-        os.chdir(cache_wd)
-    if role:
-        CloudwatchLogs(project.get_property(ENVIRONMENT), project.get_property(APPLICATION), role,
-                       logger).print_latest()
+        if not config.parallel:
+            # do not let every latest role grow sys.path
+            syspath.remove(test_dir)
+    if cloudwatch_logs:
+        cloudwatch_logs.print_latest()
     if ret != 0:
         raise BuildFailedException(f"Tavern tests failed see complete output here - {output_file}")
     return True
 
 
-def get_test_report_file(project, test_dir, tool="tavern"):
-    run_name = os.path.basename(os.path.realpath(os.path.join(test_dir, os.pardir)))
-    output_file = os.path.join(prepare_reports_directory(project), f"{tool}-{run_name}.out.xml")
+def _resolve_relative_args(args, test_dir):
+    # relative files in the additional args used to resolve against test_dir as the working directory,
+    # keep pointing them there for both "--option=file" and "file" forms
+    # only values naming a file in test_dir are rewritten, -m/-k expressions may match a folder name
+    resolved = []
+    previous = None
+    for arg in args:
+        option, separator, value = arg.partition("=") if arg.startswith("-") else ("", "", arg)
+        expression = previous in _EXPRESSION_OPTIONS or option in _EXPRESSION_OPTIONS
+        if not expression and _is_test_dir_file(value, test_dir):
+            value = os.path.join(test_dir, value)
+        resolved.append(f"{option}{separator}{value}")
+        previous = arg
+    return resolved
+
+
+def _is_test_dir_file(value, test_dir):
+    if not value or os.path.isabs(value) or not os.path.splitext(value)[1]:
+        return False
+    return os.path.isfile(os.path.join(test_dir, value))
+
+
+@contextmanager
+def _scoped_environ(variables):
+    # expose variables to the in-process test run only, restoring whatever was set before
+    previous = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _list_file_names(path):
+    # a single directory read answers both the file count and the presence checks, None if path does not exist
+    try:
+        with os.scandir(path) as it:
+            return {entry.name for entry in it}
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=256)
+def _run_name_for(test_dir):
+    # realpath lstats every path component, the same test_dir is resolved several times per build
+    return os.path.basename(os.path.realpath(os.path.join(test_dir, os.pardir)))
+
+
+def get_test_report_file(project, test_dir, tool="tavern", reports_dir=None, role=None):
+    run_name = _run_name_for(test_dir)
+    if reports_dir is None:
+        reports_dir = prepare_reports_directory(project)
+    # every latest role shares the same parent directory name so the role keeps their reports apart
+    report_name = f"{tool}-{run_name}-{role}" if role else f"{tool}-{run_name}"
+    output_file = os.path.join(reports_dir, f"{report_name}.out.xml")
     return output_file, run_name
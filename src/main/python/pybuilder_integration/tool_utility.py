@@ -1,14 +1,21 @@
+import hashlib
+import os
+
 from pybuilder.core import Logger, Project
 from pybuilder.reactor import Reactor
 
+from pybuilder_integration.directory_utility import prepare_logs_directory
 from pybuilder_integration.exec_utility import exec_command
 
+NPM_INSTALL_STAMP = "npm_install-{}.hash"
+
 
-def install_cypress(logger: Logger, project: Project, reactor: Reactor, work_dir):
+def install_cypress(logger: Logger, project: Project, reactor: Reactor, work_dir, role=None):
     _verify_npm(reactor)
     logger.info(f"Ensuring cypress is installed")
     exec_command('npm', ['install', "cypress"], f'Failed to install cypress - required for integration tests',
-                 f'{"cypress"}_npm_install.log', project, reactor, logger, report=False, working_dir=work_dir)
+                 _log_file_name("cypress_npm_install", role), project, reactor, logger, report=False,
+                 working_dir=work_dir)
 
 
 def _verify_npm(reactor):
@@ -16,9 +23,46 @@ def _verify_npm(reactor):
         command_and_arguments=["npm", "--version"], prerequisite="npm", caller="integration_tests")
 
 
-def install_npm_dependencies(work_dir, project, logger, reactor):
+def install_npm_dependencies(work_dir, project, logger, reactor, role=None):
     _verify_npm(reactor)
     exec_command('npm', ['install'], f'Failed to install package.json - required for integration tests',
-             f'package_json_npm_install.log', project, reactor, logger, report=False, working_dir=work_dir)
+                 _log_file_name("package_json_npm_install", role), project, reactor, logger, report=False,
+                 working_dir=work_dir)
+
+
+def _log_file_name(name, role):
+    # roles may install concurrently so keep their logs apart
+    return f'{name}-{role}.log' if role else f'{name}.log'
+
+
+def install_npm_dependencies_if_changed(work_dir, project, logger, reactor, role=None):
+    # skip npm install when node_modules was already installed from the same package.json/package-lock.json
+    digest = _hash_npm_manifests(work_dir)
+    stamp_file = _npm_install_stamp_file(work_dir, project)
+    try:
+        with open(stamp_file) as fp:
+            if fp.read() == digest and os.path.isdir(os.path.join(work_dir, "node_modules")):
+                logger.info("package.json unchanged since last install, skipping npm install")
+                return
+    except FileNotFoundError:
+        pass
+    install_npm_dependencies(work_dir, project=project, logger=logger, reactor=reactor, role=role)
+    with open(stamp_file, "w") as fp:
+        fp.write(digest)
+
+
+def _npm_install_stamp_file(work_dir, project):
+    # kept with the logs, keyed by work_dir, so the stamp is never packaged with node_modules
+    key = hashlib.sha256(os.path.abspath(work_dir).encode()).hexdigest()[:16]
+    return os.path.join(prepare_logs_directory(project), NPM_INSTALL_STAMP.format(key))
 
 
+def _hash_npm_manifests(work_dir):
+    sha = hashlib.sha256()
+    for manifest in ["package.json", "package-lock.json"]:
+        try:
+            with open(os.path.join(work_dir, manifest), "rb") as fp:
+                sha.update(fp.read())
+        except FileNotFoundError:
+            pass
+    return sha.hexdigest()
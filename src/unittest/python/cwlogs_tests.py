@@ -1,5 +1,5 @@
 import os
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from pybuilder.core import Logger
 
@@ -39,3 +39,16 @@ class CWTestCase(ParentTestCase):
         cwLogs = CloudwatchLogs('unit-test','foo','bar',Mock(Logger))
         cwLogs.cwclient = DummyClient()
         cwLogs.print_latest()
+
+    def test_prefetch_client(self):
+        cwLogs = CloudwatchLogs('unit-test','foo','bar',Mock(Logger))
+        client = DummyClient()
+        with patch("boto3.client", Mock(return_value=client)) as boto_client:
+            cwLogs.prefetch_client()
+            cwLogs.print_latest()
+        boto_client.assert_called_once_with('logs')
+        self.assertIs(client, cwLogs.cwclient, "Expected prefetched client to be reused")
+        failing = CloudwatchLogs('unit-test','foo','bar',Mock(Logger))
+        with patch("boto3.client", Mock(side_effect=Exception("no region"))):
+            failing.prefetch_client()
+        self.assertIsNone(failing.cwclient, "Expected failed prefetch to leave no client")
@@ -1,4 +1,10 @@
 import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from pybuilder.core import Project
+from pybuilder.plugins import core_plugin
 
 import pybuilder_integration
 import pybuilder_integration.directory_utility
@@ -29,5 +35,51 @@ class DirectoryUtilityTestCase(ParentTestCase):
         pybuilder_integration.directory_utility.get_working_distribution_directory(project=self.project)
         self.assertTrue(os.path.exists(f"{dist_dir}/integration/working"), "Failed to create dist directory")
 
+    def test_directory_prepared_per_project(self):
+        logs_dir = pybuilder_integration.directory_utility.prepare_logs_directory(project=self.project)
+        self.assertEqual(logs_dir, pybuilder_integration.directory_utility.prepare_logs_directory(project=self.project),
+                         "Expected the same logs directory for the same project")
+        other_dir = tempfile.mkdtemp()
+        try:
+            other_project = Project(basedir=other_dir)
+            core_plugin.init(other_project)
+            other_logs_dir = pybuilder_integration.directory_utility.prepare_logs_directory(project=other_project)
+            self.assertTrue(other_logs_dir.startswith(other_dir), "Expected logs directory of the other project")
+            self.assertTrue(os.path.exists(other_logs_dir), "Failed to create logs directory")
+        finally:
+            shutil.rmtree(other_dir)
+
+    def test_merge_directory_concurrently(self):
+        destination = f"{self.tmpDir}/destination"
+        os.makedirs(f"{destination}/videos")
+        sources = []
+        for index in range(8):
+            source = f"{self.tmpDir}/source-{index}"
+            self._configure_mock_tests_dir(f"{source}/videos", "spec.mp4")
+            sources.append(source)
+
+        def _merge(source):
+            for _ in range(200):
+                pybuilder_integration.directory_utility.merge_directory(source, destination)
 
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            for future in [executor.submit(_merge, source) for source in sources]:
+                future.result()
+        self.assertTrue(os.path.exists(f"{destination}/videos/spec.mp4"), "Failed to merge directory")
 
+    def test_merge_directory(self):
+        source = f"{self.tmpDir}/source"
+        destination = f"{self.tmpDir}/destination"
+        self._configure_mock_tests_dir(f"{source}/nested", "result.xml")
+        # destination does not exist so the source is moved
+        pybuilder_integration.directory_utility.merge_directory(source, destination)
+        self.assertTrue(os.path.exists(f"{destination}/nested/result.xml"), "Failed to move directory")
+        self.assertFalse(os.path.exists(source), "Expected source to be moved")
+        # destination exists so the files are merged in
+        self._configure_mock_tests_dir(f"{source}/nested/other", "other.xml")
+        with open(f"{source}/nested/result.xml", "w") as fp:
+            fp.write("updated")
+        pybuilder_integration.directory_utility.merge_directory(source, destination)
+        self.assertTrue(os.path.exists(f"{destination}/nested/other/other.xml"), "Failed to merge directory")
+        with open(f"{destination}/nested/result.xml") as fp:
+            self.assertEqual("updated", fp.read(), "Expected existing file to be replaced")
@@ -19,6 +19,8 @@ def _pytest_main(args: Optional[Union[List[str], py.path.local]] = None,
     return 0
 
 fail = False
+# generate_mock replaces pytest.main, keep the real one for tests that run tavern for real
+pytest_main = pytest.main
 
 def _execute_create_files(command_and_arguments,
                           outfile_name=None,
@@ -35,11 +37,23 @@ def _execute_create_files(command_and_arguments,
         pass
     with open(error_file_name, "w") as of:
         pass
+    if command_and_arguments[:2] == ["npm", "install"] and cwd:
+        _install_mock_cypress(cwd)
     if fail:
         return 1
     else:
         return 0
 
+def _install_mock_cypress(work_dir):
+    cypress_dir = f"{work_dir}/node_modules/cypress"
+    os.makedirs(f"{cypress_dir}/bin", exist_ok=True)
+    with open(f"{cypress_dir}/package.json", "w") as fp:
+        pass
+    executable = f"{cypress_dir}/bin/cypress"
+    with open(executable, "w") as fp:
+        pass
+    os.chmod(executable, 0o755)
+
 class ParentTestCase(TestCase):
 
     def setUp(self) -> None:
@@ -51,6 +65,7 @@ class ParentTestCase(TestCase):
         init_python_directories(self.project)
 
     def tearDown(self):
+        pytest.main = pytest_main
         shutil.rmtree(self.tmpDir)
 
     def generate_mock(self):
@@ -76,12 +91,15 @@ class ParentTestCase(TestCase):
                                     prerequisite="npm",
                                     caller="integration_tests")
 
-    def _assert_s3_transfer(self, source, destination, verify_execute, recursive=True):
-        args = ["aws", "s3", "cp", source, destination]
-        if recursive:
+    def _assert_s3_transfer(self, source, destination, verify_execute, recursive=True,
+                            log_file_name="s3-artifact-transfer", sync=False):
+        args = ["aws", "s3", "sync" if sync else "cp", source, destination]
+        if sync:
+            args.append("--delete")
+        elif recursive:
             args.append("--recursive")
         verify_execute.assert_any_call(args,
-                                       f"{self.tmpDir}/target/logs/integration/s3-artifact-transfer")
+                                       f"{self.tmpDir}/target/logs/integration/{log_file_name}")
 
     def _configure_mock_tests_dir(self, default_path, file_name):
         os.makedirs(f"{default_path}")
@@ -1,4 +1,7 @@
 import os
+import shlex
+import sys
+from unittest.mock import patch
 from zipfile import ZipFile
 
 from pybuilder.errors import BuildFailedException
@@ -47,7 +50,8 @@ class TaskTestCase(ParentTestCase):
         self.assertTrue(os.path.exists(zip_location), "Did not find bundled artifacts")
         expected = ["None/",f"None/{file_name}"]
         with ZipFile(zip_location, 'r') as zipObj:
-            listOfiles = zipObj.namelist()
+            # ignore the cypress install left behind by the mocked npm install
+            listOfiles = [name for name in zipObj.namelist() if "/node_modules/" not in name]
             self.assertEqual(len(listOfiles), len(expected), "Found more entries in zip than expected")
             self.assertEqual(listOfiles, expected, "Did not find expected entry")
 
@@ -61,6 +65,28 @@ class TaskTestCase(ParentTestCase):
         finally:
             parent_test_case.fail = False
 
+    def test_exec_output_read_on_demand(self):
+        mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
+        command = exec_utility.WorkingDirCommandBuilder(command_name="foo", project=self.project, cwd=self.tmpDir,
+                                                        reactor=reactor)
+        outfile_name = f"{self.tmpDir}/foo.log"
+        result = command.run(outfile_name)
+        self.assertEqual(0, result.exit_code, "Expected successful execution")
+        with open(outfile_name, "w") as fp:
+            fp.write("bar\n")
+        self.assertEqual(["bar\n"], result.report_lines, "Expected output to be read from the log file")
+        self.assertEqual([], result.error_report_lines, "Expected empty error output")
+
+    def test_cypress_not_installed(self):
+        mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
+        work_dir = os.path.join(self.tmpDir, "cypress")
+        os.makedirs(work_dir)
+        self.assertRaises(BuildFailedException, pybuilder_integration.tasks._resolve_cypress_executable, work_dir)
+        parent_test_case._install_mock_cypress(work_dir)
+        self.assertEqual(os.path.join(work_dir, "node_modules/cypress/bin/cypress"),
+                         pybuilder_integration.tasks._resolve_cypress_executable(work_dir),
+                         "Did not resolve cypress executable")
+
     def test_verify_no_files(self):
         mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
         before = verify_execute.call_count
@@ -72,9 +98,92 @@ class TaskTestCase(ParentTestCase):
         pybuilder_integration.tasks._run_cypress_tests_in_directory(work_dir=os.path.join(self.tmpDir, "fake"),
                                                                     logger=mock_logger, project=self.project,
                                                                     reactor=reactor)
+        for dist_directory in [None, os.path.join(self.tmpDir, "fake")]:
+            pybuilder_integration.tasks._run_tests_in_directory(dist_directory, mock_logger, self.project, reactor,
+                                                                latest=True)
         self.assertEqual(before, verify_execute.call_count, "Got unexpected execution")
         self.assertEqual(before_pytest, self.pytest_main_mock.call_count, "Got unexpected execution for tavern")
 
+    def test_latest_failures_reported_for_all_roles(self):
+        mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
+        self.project.set_property(pybuilder_integration.properties.INTEGRATION_TARGET_URL, "foo")
+        self.pytest_main_mock.side_effect = lambda args: 1
+        latest_dir = directory_utility.get_latest_distribution_directory(self.project)
+        roles = ["bar", "foo"]
+        for role in roles:
+            self._configure_mock_tests_dir(f"{latest_dir}/tavern/{role}", "test.tavern.yaml")
+        with self.assertRaises(BuildFailedException) as context:
+            pybuilder_integration.tasks._run_tests_in_directory(latest_dir, mock_logger, self.project, reactor,
+                                                                latest=True)
+        self.assertEqual(len(roles), self.pytest_main_mock.call_count, "Expected every role to run")
+        for role in roles:
+            self.assertIn(role, str(context.exception), "Expected failing role in exception")
+
+    def test_latest_roles_import_own_helpers(self):
+        mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
+        self.project.set_property(pybuilder_integration.properties.INTEGRATION_TARGET_URL, "foo")
+        latest_dir = directory_utility.get_latest_distribution_directory(self.project)
+        # role directories with spaces must still end up on every worker's path
+        roles = {"role one": "one", "role two": "two"}
+        for role, name in roles.items():
+            role_dir = f"{latest_dir}/tavern/{role}"
+            with open(self._configure_mock_tests_dir(role_dir, f"helper_{name}.py"), "w") as fp:
+                fp.write(f"ROLE = '{role}'\n")
+            with open(self._configure_mock_tests_dir(f"{role_dir}/tests", f"test_{name}.py"), "w") as fp:
+                fp.write(f"import helper_{name}\n\n\ndef test_helper():\n    assert helper_{name}.ROLE == '{role}'\n")
+        # run the real pytest with more than one xdist worker regardless of the machine
+        parent_test_case.pytest.main = parent_test_case.pytest_main
+        with patch("pybuilder_integration.tasks._available_workers", return_value=2), \
+                patch("pybuilder_integration.cloudwatchlogs_utility.CloudwatchLogs.prefetch_client"), \
+                patch("pybuilder_integration.cloudwatchlogs_utility.CloudwatchLogs.print_latest"):
+            pybuilder_integration.tasks._run_tests_in_directory(latest_dir, mock_logger, self.project, reactor,
+                                                                latest=True)
+        for role in roles:
+            output_file, run_name = pybuilder_integration.tasks.get_test_report_file(
+                project=self.project, test_dir=f"{latest_dir}/tavern/{role}", role=role)
+            self.assertTrue(os.path.exists(output_file), f"Expected junit report for {role}")
+
+    def test_serial_tavern_keeps_configured_pythonpath(self):
+        mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
+        self.project.set_property(pybuilder_integration.properties.INTEGRATION_TARGET_URL, "foo")
+        test_dir = os.path.join(self.tmpDir, "tavern tests")
+        with open(self._configure_mock_tests_dir(test_dir, "pytest.ini"), "w") as fp:
+            fp.write("[pytest]\npythonpath = lib\n")
+        self._configure_mock_tests_dir(f"{test_dir}/lib", "helper_lib.py")
+        open(f"{test_dir}/helper_root.py", "w").close()
+        with open(self._configure_mock_tests_dir(f"{test_dir}/tests", "test_paths.py"), "w") as fp:
+            fp.write("import helper_lib\nimport helper_root\n\n\ndef test_helpers():\n    pass\n")
+        parent_test_case.pytest.main = parent_test_case.pytest_main
+        with patch("pybuilder_integration.tasks._available_workers", return_value=1):
+            self.assertTrue(pybuilder_integration.tasks._run_tavern_tests_in_dir(test_dir, mock_logger, self.project,
+                                                                                 reactor))
+        self.assertNotIn(test_dir, sys.path, "Expected test directory to be removed from sys.path")
+
+    def test_tavern_parallel_disabled(self):
+        with patch("pybuilder_integration.tasks._available_workers", return_value=4):
+            for disabled in (False, "false", "False"):
+                self.project.set_property(pybuilder_integration.properties.TAVERN_PARALLEL, disabled)
+                config = pybuilder_integration.tasks.get_tavern_config(self.project)
+                self.assertFalse(config.parallel, f"Expected {disabled!r} to disable parallel tavern runs")
+                self.assertNotIn("-n", config.pytest_args, "Expected no xdist workers")
+            self.project.set_property(pybuilder_integration.properties.TAVERN_PARALLEL, "true")
+            self.assertEqual(("-n", "4"), pybuilder_integration.tasks.get_tavern_config(self.project).pytest_args,
+                             "Expected xdist workers when parallel runs are enabled")
+
+    def test_tavern_relative_args_resolved_against_test_dir(self):
+        test_dir = os.path.join(self.tmpDir, "tavern")
+        self._configure_mock_tests_dir(test_dir, "common.yaml")
+        # folders named like a marker or keyword must not turn the expression into a path
+        self._configure_mock_tests_dir(f"{test_dir}/smoke", "smoke.yaml")
+        args = ["--tavern-global-cfg=common.yaml", "--tavern-global-cfg", "common.yaml", "-k", "smoke",
+                "-m", "smoke", "-k=smoke", "smoke", "--missing=other.yaml", f"--absolute={test_dir}/common.yaml"]
+        self.assertEqual(["--tavern-global-cfg=" + os.path.join(test_dir, "common.yaml"),
+                          "--tavern-global-cfg", os.path.join(test_dir, "common.yaml"),
+                          "-k", "smoke", "-m", "smoke", "-k=smoke", "smoke",
+                          "--missing=other.yaml", f"--absolute={test_dir}/common.yaml"],
+                         pybuilder_integration.tasks._resolve_relative_args(args, test_dir),
+                         "Expected relative files to resolve against the test directory")
+
     def test_verify_tavern(self):
         mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
         pybuilder_integration.init_plugin(self.project)
@@ -83,24 +192,43 @@ class TaskTestCase(ParentTestCase):
         self.project.set_property(pybuilder_integration.properties.INTEGRATION_TARGET_URL, target_url)
         file_name = "test.tavern.yaml"
         self._configure_mock_test_files(file_name, "tavern")
+        run_environment = {}
+
+        def _record_environment(args):
+            run_environment.update(os.environ)
+            return 0
+
+        self.pytest_main_mock.side_effect = _record_environment
+        os.environ.pop("TARGET", None)
         pybuilder_integration.tasks.verify_tavern(project=self.project, logger=mock_logger, reactor=reactor)
+        self.assertEqual(target_url, run_environment.get("TARGET"), "Expected TARGET during tavern run")
+        self.assertNotIn("TARGET", os.environ, "Expected TARGET to be removed after tavern run")
         self._assert_called_tavern_execution(f"{self.tmpDir}/src/integrationtest/tavern", target_url, verify_execute)
         self._validate_zip_file(file_name, "tavern")
 
-    def _assert_called_tavern_execution(self, test_dir, target_url, verify_execute):
+    def _assert_called_tavern_execution(self, test_dir, target_url, verify_execute, role=None):
         output_file, run_name = pybuilder_integration.tasks.get_test_report_file(project=self.project,
-                                                                                 test_dir=test_dir)
+                                                                                 test_dir=test_dir,
+                                                                                 role=role)
         self.pytest_main_mock.assert_any_call(
             [
+                "--rootdir",
+                f"{test_dir}",
                 "--junit-xml",
                 f"{output_file}",
                 f"{test_dir}"
-            ])
+            ] + self._expected_parallel_args(test_dir))
+
+    def _expected_parallel_args(self, test_dir):
+        workers = pybuilder_integration.tasks._available_workers()
+        return ["-n", str(workers), "-o", f"pythonpath={shlex.quote(test_dir)}"] if workers > 1 else []
 
-    def _assert_cypress_run(self, test_directory, target_url, verify_execute, config_file=False,env={}):
+    def _assert_cypress_run(self, test_directory, target_url, verify_execute, config_file=False,env={},
+                            log_file_name="cypress_run.log", role=None):
         results_file, run_name = pybuilder_integration.tasks.get_test_report_file(project=self.project,
                                                                                  test_dir=test_directory,
-                                                                                 tool="cypress")
+                                                                                 tool="cypress",
+                                                                                 role=role)
         args = [f"{test_directory}/node_modules/cypress/bin/cypress","run",
                 f"--config", f"baseUrl={target_url}","--reporter-options",
                 f"mochaFile={results_file}", "--record"]
@@ -109,7 +237,7 @@ class TaskTestCase(ParentTestCase):
             args.append("--config-file")
             args.append(f'{environment}-config.json')
         verify_execute.assert_any_call(args,
-                                       f"{self.tmpDir}/target/logs/integration/cypress_run.log",
+                                       f"{self.tmpDir}/target/logs/integration/{log_file_name}",
                                        cwd=test_directory,
                                        env=env)
 
@@ -144,19 +272,27 @@ class TaskTestCase(ParentTestCase):
         self._assert_s3_transfer(destination=directory_utility.get_latest_zipped_distribution_directory(self.project),
                                  source=artifact_manager.get_latest_artifact_destination(logger=mock_logger,
                                                                                          project=self.project),
-                                 verify_execute=verify_execute, recursive=True)
+                                 verify_execute=verify_execute, sync=True)
         # Run against latest
-        self._assert_called_tavern_execution(os.path.dirname(tavern_latest_test_dir), target_url, verify_execute)
-        self._assert_cypress_run(os.path.dirname(cypress_latest_test_dir), target_url, verify_execute, env=env_vars)
+        self._assert_called_tavern_execution(os.path.dirname(tavern_latest_test_dir), target_url, verify_execute,
+                                             role=role)
+        self._assert_cypress_run(os.path.dirname(cypress_latest_test_dir), target_url, verify_execute, env=env_vars,
+                                 log_file_name=f"cypress_run-{role}.log", role=role)
+        verify_execute.assert_any_call(["npm", "install", "cypress"],
+                                       f"{self.tmpDir}/target/logs/integration/cypress_npm_install-{role}.log",
+                                       env={},
+                                       cwd=os.path.dirname(cypress_latest_test_dir))
         # Promote local tavern archive to latest & upload local archive to versioned dir - cypress does not exist
         zip_artifact_path = directory_utility.get_local_zip_artifact_path(tool="tavern", project=self.project,
                                                                           include_ending=True)
         self._assert_s3_transfer(source=zip_artifact_path,
                                  destination=artifact_manager.get_versioned_artifact_destination(logger=mock_logger,
                                                                                                  project=self.project),
-                                 verify_execute=verify_execute, recursive=False)
+                                 verify_execute=verify_execute, recursive=False,
+                                 log_file_name=f"s3-artifact-transfer-{os.path.basename(zip_artifact_path)}")
         self._assert_s3_transfer(source=zip_artifact_path,
                                      destination=artifact_manager.get_latest_artifact_destination(logger=mock_logger,
                                                                                                   project=self.project),
-                                     verify_execute=verify_execute, recursive=False)
+                                     verify_execute=verify_execute, recursive=False,
+                                     log_file_name=f"s3-artifact-transfer-{os.path.basename(zip_artifact_path)}")
 
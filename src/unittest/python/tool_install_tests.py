@@ -1,4 +1,5 @@
 import os
+import shutil
 
 import pybuilder_integration
 import pybuilder_integration.directory_utility
@@ -21,3 +22,33 @@ class ToolInstallTestCase(ParentTestCase):
                                           f"{self.tmpDir}/target/logs/integration/cypress_npm_install.log",
                                        env={},
                                        cwd=self.tmpDir)
+
+    def test_npm_install_skipped_when_unchanged(self):
+        mock_logger, verify_mock, verify_execute, reactor = self.generate_mock()
+        with open(f"{self.tmpDir}/package.json", "w") as fp:
+            fp.write("{}")
+        npm_install = ["npm", "install"]
+        for _ in range(2):
+            pybuilder_integration.tool_utility.install_npm_dependencies_if_changed(work_dir=self.tmpDir,
+                                                                                 project=self.project,
+                                                                                 logger=mock_logger,
+                                                                                 reactor=reactor)
+        installs = [call for call in verify_execute.call_args_list if call.args[0] == npm_install]
+        self.assertEqual(1, len(installs), "Expected npm install to be skipped for unchanged package.json")
+        with open(f"{self.tmpDir}/package.json", "w") as fp:
+            fp.write('{"name": "changed"}')
+        pybuilder_integration.tool_utility.install_npm_dependencies_if_changed(work_dir=self.tmpDir,
+                                                                             project=self.project,
+                                                                             logger=mock_logger,
+                                                                             reactor=reactor)
+        installs = [call for call in verify_execute.call_args_list if call.args[0] == npm_install]
+        self.assertEqual(2, len(installs), "Expected npm install after package.json changed")
+        self.assertEqual(["cypress"], os.listdir(f"{self.tmpDir}/node_modules"),
+                         "Expected the install stamp to be kept out of node_modules")
+        shutil.rmtree(f"{self.tmpDir}/node_modules")
+        pybuilder_integration.tool_utility.install_npm_dependencies_if_changed(work_dir=self.tmpDir,
+                                                                             project=self.project,
+                                                                             logger=mock_logger,
+                                                                             reactor=reactor)
+        installs = [call for call in verify_execute.call_args_list if call.args[0] == npm_install]
+        self.assertEqual(3, len(installs), "Expected npm install when node_modules is missing")